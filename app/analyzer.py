@@ -1,45 +1,46 @@
 
 from __future__ import annotations
-import os, io, time, re, threading, random, logging
+import os, csv, time, re, threading, random, logging
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any, Tuple
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple
 
-import requests
+from concurrent.futures import Future, ThreadPoolExecutor
 from http.cookiejar import MozillaCookieJar
-import pandas as pd
+
+# httpx, pandas, numpy and xlsxwriter are imported where they are used so the
+# GUI can show its window without loading them first.
+if TYPE_CHECKING:
+    import httpx
+    import pandas as pd
 
 log = logging.getLogger(__name__)
 
 # ------------------------- Rate limiter -------------------------
 class TokenBucket:
+    """Deadline-based limiter: one request per interval, up to `burst` at once.
+
+    Tracks the next theoretical send time instead of a float token count.
+    Requests are issued from the single worker thread, so no lock is taken.
+    """
     def __init__(self, rate_per_minute: int, burst: int = 5):
-        self.capacity = max(1, burst)
-        self.tokens = self.capacity
-        self.rate = max(1, rate_per_minute) / 60.0
-        self.lock = threading.Lock()
-        self.last = time.perf_counter()
+        self.interval = 60.0 / max(1, rate_per_minute)
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self.next_ready = time.monotonic()
 
     def acquire(self, stop_event: Optional[threading.Event] = None):
-        while True:
-            if stop_event is not None and stop_event.is_set():
-                raise StopIteration
-            with self.lock:
-                now = time.perf_counter()
-                delta = now - self.last
-                self.last = now
-                self.tokens = min(self.capacity, self.tokens + delta * self.rate)
-                if self.tokens >= 1:
-                    self.tokens -= 1
-                    return
-                need = (1 - self.tokens) / self.rate
-            # Sleep in small chunks to be stop-able
-            t = 0.0
-            while t < max(0.05, need):
-                if stop_event is not None and stop_event.is_set():
+        if stop_event is not None and stop_event.is_set():
+            raise StopIteration
+        now = time.monotonic()
+        wait = self.next_ready - self.tolerance - now
+        if wait > 0:
+            # Event.wait wakes up as soon as stop is requested
+            if stop_event is not None:
+                if stop_event.wait(wait):
                     raise StopIteration
-                sl = min(0.1, max(0.05, need) - t)
-                time.sleep(sl)
-                t += sl
+            else:
+                time.sleep(wait)
+            now += wait
+        self.next_ready = max(self.next_ready, now) + self.interval
 
 # ------------------------- HTTP client -------------------------
 @dataclass
@@ -55,8 +56,15 @@ class ClientConfig:
 
 class AvitoClient:
     def __init__(self, cookies_path: Optional[str], cfg: ClientConfig):
-        self.s = requests.Session()
-        self.s.headers.update({'User-Agent': cfg.user_agent, 'Accept-Language': 'ru-RU,ru;q=0.9'})
+        import httpx
+        self.client = httpx.Client(
+            http2=True,
+            # Accept-Encoding is left to httpx: it offers br only when brotli is installed
+            headers={'User-Agent': cfg.user_agent, 'Accept-Language': 'ru-RU,ru;q=0.9'},
+            timeout=cfg.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=5),
+        )
         self.cfg = cfg
         self.bucket = TokenBucket(cfg.rate_per_min, cfg.burst)
         if cookies_path:
@@ -70,27 +78,82 @@ class AvitoClient:
             cj = MozillaCookieJar()
             cj.load(path, ignore_discard=True, ignore_expires=True)
             for c in cj:
-                self.s.cookies.set_cookie(c)
+                self.client.cookies.jar.set_cookie(c)
             log.info('Loaded %d cookies from %s', len(cj), path)
         except Exception:
             log.exception('Failed to load cookies from %s', path)
 
-    def get(self, url: str, params: Optional[dict] = None, stop_event: Optional[threading.Event] = None) -> requests.Response:
+    def get(self, url: str, params: Optional[dict] = None, stop_event: Optional[threading.Event] = None) -> httpx.Response:
+        """Send a streamed GET; the caller reads the body and must close the response."""
+        import httpx
         self.bucket.acquire(stop_event=stop_event)
         try:
-            r = self.s.get(url, params=params, timeout=self.cfg.timeout, allow_redirects=True)
+            r = self.client.send(self.client.build_request('GET', url, params=params), stream=True)
+            log.debug('GET %s -> %s, Content-Encoding=%s', url, r.status_code, r.headers.get('Content-Encoding'))
             return r
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             log.warning('Network error on GET %s: %s', url, e)
             raise
 
-# ------------------------- Parsing stub -------------------------
-PRICE_RE = re.compile(r"(\d[\d\s]{2,}\s?[₽Рр])")
+    def close(self):
+        self.client.close()
 
-def parse_listing(html: str) -> Dict[str, Any]:
+# ------------------------- Parsing stub -------------------------
+try:
+    import re2  # linear-time DFA engine (google-re2)
+except ImportError:
+    re2 = None
+
+def _compile_bytes(pattern: bytes):
+    """Compile a byte pattern with re2 when available, else with re."""
+    if re2 is None:
+        return re.compile(pattern)
+    # re2 reads patterns as UTF-8 by default, where \xe2 means U+00E2 rather
+    # than a raw byte; Latin-1 mode keeps the byte semantics of re.
+    opts = re2.Options()
+    opts.encoding = re2.Options.Encoding.LATIN1
+    return re2.compile(pattern, options=opts)
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# Byte pattern so the body never has to be decoded as a whole; NBSP and narrow
+# NBSP are spelled out as UTF-8 since \s only covers ASCII whitespace in bytes.
+_SP = rb'(?:\s|\xc2\xa0|\xe2\x80\xaf)'
+PRICE_RE = _compile_bytes(
+    rb'(\d(?:\d|' + _SP + rb'){2,}' + _SP + rb'?(?:\xe2\x82\xbd|\xd0\xa0|\xd1\x80))'
+)
+
+_JSONLD_RE = _compile_bytes(rb'(?s)<script[^>]*application/ld\+json[^>]*>(.*?)</script>')
+
+def _jsonld_price(html_bytes: bytes) -> Optional[str]:
+    """Price from the first JSON-LD block that carries offers.price, if any."""
+    for m in _JSONLD_RE.finditer(html_bytes):
+        try:
+            data = json_loads(m.group(1))
+        except ValueError:
+            continue
+        for node in (data if isinstance(data, list) else [data]):
+            if not isinstance(node, dict):
+                continue
+            offers = node.get('offers')
+            if isinstance(offers, list):
+                offers = offers[0] if offers else None
+            if isinstance(offers, dict) and offers.get('price') is not None:
+                return str(offers['price'])
+    return None
+
+# Keys returned by parse_listing; the checkpoint always has a column for each
+LISTING_FIELDS = ('found_price_text',)
+
+def parse_listing(html_bytes: bytes) -> Dict[str, Any]:
     """Replace with your lawful parsing logic."""
-    m = PRICE_RE.search(html)
-    price_text = m.group(1) if m else None
+    price_text = _jsonld_price(html_bytes)
+    if price_text is None:
+        m = PRICE_RE.search(html_bytes)
+        price_text = m.group(1).decode('utf-8', errors='replace') if m else None
     return {
         'found_price_text': price_text,
     }
@@ -102,49 +165,50 @@ class Item:
     brand: str
     model: str
     buy_price: Optional[float]
+    query_str: str = ''
+
+    def __post_init__(self):
+        # Built once here so the worker loop reads a plain attribute
+        if not self.query_str:
+            self.query_str = self.query()
 
     def query(self) -> str:
         parts = [str(self.brand or '').strip(), str(self.model or '').strip()]
         return ' '.join([p for p in parts if p])
 
 def load_items_from_excel(path: str) -> List[Item]:
+    import numpy as np
+    import pandas as pd
+
     if not os.path.exists(path):
         raise FileNotFoundError(path)
-    with open(path, 'rb') as f:
-        content = f.read()
-    df = pd.read_excel(io.BytesIO(content))
-
-    def try_col(df, name, pos):
-        if name in df.columns:
-            return df[name]
-        return df.iloc[:, pos]
-
-    try:
-        brand_col = try_col(df, 'A', 0)
-    except Exception:
-        brand_col = df.iloc[:, 0]
-    try:
-        model_col = try_col(df, 'B', 1)
-    except Exception:
-        model_col = df.iloc[:, 1]
-    buy_col = None
-    try:
-        buy_col = try_col(df, 'C', 2)
-    except Exception:
-        pass
+    # Only columns A/B/C are used; read them as plain strings and let openpyxl
+    # stream the workbook from disk (pandas opens it read_only/data_only).
+    engine = 'openpyxl' if path.lower().endswith(('.xlsx', '.xlsm')) else None
+    # Column C (buy price) is optional, so size usecols from the header row
+    ncols = len(pd.read_excel(path, engine=engine, nrows=0, header=0).columns)
+    usecols = list(range(min(3, ncols)))
+    df = pd.read_excel(path, engine=engine, usecols=usecols, dtype=str, header=0)
+
+    # Pull columns A/B/C out once and clean them column-wise instead of
+    # dispatching into pandas for every cell.
+    arr = df.iloc[:, :3].to_numpy(dtype=object)
+    brands = np.where(pd.isna(arr[:, 0]), '', arr[:, 0]).astype(str).tolist()
+    models = np.where(pd.isna(arr[:, 1]), '', arr[:, 1]).astype(str).tolist()
+    if arr.shape[1] > 2:
+        buy = pd.to_numeric(
+            pd.Series(arr[:, 2]).astype(str)
+            .str.replace(' ', '', regex=False)
+            .str.replace(',', '.', regex=False),
+            errors='coerce',
+        ).to_numpy(dtype=float)
+    else:
+        buy = np.full(len(arr), np.nan)
 
     items: List[Item] = []
-    for i in range(len(df)):
-        brand = str(brand_col.iloc[i]) if pd.notna(brand_col.iloc[i]) else ''
-        model = str(model_col.iloc[i]) if pd.notna(model_col.iloc[i]) else ''
-        buy = None
-        if buy_col is not None and pd.notna(buy_col.iloc[i]):
-            try:
-                buy = float(str(buy_col.iloc[i]).replace(' ', '').replace(',', '.'))
-            except Exception:
-                buy = None
-        if brand or model:
-            items.append(Item(i, brand, model, buy))
+    for i, (b, m, p) in enumerate(zip(brands, models, buy)):
+        if b or m:
+            items.append(Item(i, b, m, None if np.isnan(p) else float(p)))
     return items
 
 # ------------------------- Worker -------------------------
@@ -158,11 +222,11 @@ class Result:
     note: str = ''
 
 def respectful_sleep(seconds: float, stop_event: Optional[threading.Event] = None):
-    end = time.time() + seconds
-    while time.time() < end:
-        if stop_event is not None and stop_event.is_set():
+    if stop_event is not None:
+        if stop_event.wait(seconds):
             raise StopIteration
-        time.sleep(0.1)
+    else:
+        time.sleep(seconds)
 
 def backoff(attempt: int, retry_after: Optional[int] = None, stop_event: Optional[threading.Event] = None):
     if retry_after:
@@ -172,85 +236,192 @@ def backoff(attempt: int, retry_after: Optional[int] = None, stop_event: Optiona
     log.info('Backoff: sleeping %s s', delay)
     respectful_sleep(delay, stop_event=stop_event)
 
-def has_captcha(text: str) -> bool:
-    return 'captcha' in text.lower() or 'капча' in text.lower()
+# IGNORECASE only folds ASCII for byte patterns, so common Cyrillic casings are listed
+_CAPTCHA_RE = re.compile(
+    b'|'.join(w.encode('utf-8') for w in ('captcha', 'капча', 'Капча', 'КАПЧА')),
+    re.IGNORECASE,
+)
+
+def has_captcha(content: bytes) -> bool:
+    return _CAPTCHA_RE.search(content) is not None
+
+def _read_until_match(r: httpx.Response, chunk_size: int = 65536) -> bytes:
+    """Read the body until a captcha marker or a JSON-LD block with offers shows up.
+
+    Visible price text often appears before the JSON-LD (e.g. similar listings),
+    so it does not stop the read; PRICE_RE is only parse_listing's fallback.
+    Pages without such a JSON-LD block are therefore read to the end.
+    Each byte is scanned once: offsets are kept across chunks, including inside
+    a <script> block that is still open.
+    """
+    buf = bytearray()
+    pos = 0         # where to look for the next <script opener
+    body_at = None  # start of the open ld+json block's body, if any
+    close_from = 0  # where to look for that block's </script>
+    for chunk in r.iter_bytes(chunk_size):
+        # Rescan only the new chunk plus a small overlap for matches split across chunks
+        start = max(0, len(buf) - 64)
+        buf += chunk
+        if _CAPTCHA_RE.search(bytes(buf[start:])):
+            break
+        while True:
+            if body_at is None:
+                tag_at = buf.find(b'<script', pos)
+                if tag_at == -1:
+                    pos = max(pos, len(buf) - len(b'<script'))
+                    break
+                tag_end = buf.find(b'>', tag_at)
+                if tag_end == -1:
+                    pos = tag_at  # opener cut by the chunk boundary
+                    break
+                if buf.find(b'application/ld+json', tag_at, tag_end) != -1:
+                    body_at = close_from = tag_end + 1
+                else:
+                    pos = tag_end + 1
+            else:
+                end = buf.find(b'</script>', close_from)
+                if end == -1:
+                    close_from = max(close_from, len(buf) - len(b'</script>'))
+                    break
+                if buf.find(b'"offers"', body_at, end) != -1:
+                    return bytes(buf)
+                body_at = None
+                pos = end + len(b'</script>')
+    return bytes(buf)
 
 def process_items(items: List[Item], client: AvitoClient, checkpoint: str = 'checkpoint.csv',
                   stop_event: Optional[threading.Event] = None, progress_cb=None) -> List[Result]:
     results: List[Result] = []
-    done_idx: set[int] = set()
+    last_flushed_idx = 0
 
     # resume support
-    if os.path.exists(checkpoint):
-        try:
-            prev = pd.read_csv(checkpoint)
-            done_idx = set(prev['idx'].astype(int).tolist())
-        except Exception:
-            pass
+    done_idx, header_written = _read_checkpoint(checkpoint)
 
     attempts: Dict[int, int] = {}
+    # Parsing runs beside the next rate-limit wait / GET; rows are completed
+    # before they are checkpointed.
+    pending: List[Tuple[Result, Future]] = []
 
     total = len(items)
     processed = 0
 
-    for it in items:
-        if stop_event is not None and stop_event.is_set():
-            break
-        if it.idx in done_idx:
-            processed += 1
-            if progress_cb:
-                progress_cb(processed, total, f"skip idx={it.idx}")
-            continue
+    # Loop invariants bound to locals once
+    url = client.cfg.base_url
+    get = client.get
+    pcb = progress_cb
+    append_ck = _append_checkpoint
 
-        q = it.query()
-        url = client.cfg.base_url
+    with ThreadPoolExecutor(max_workers=1) as parser:
+        try:
+            for it in items:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if it.idx in done_idx:
+                    processed += 1
+                    if pcb:
+                        pcb(processed, total, f"skip idx={it.idx}")
+                    continue
+
+                q = it.query_str
+
+                try:
+                    if pcb:
+                        pcb(processed, total, f"GET {url} q={q}")
+                    r = get(url, params={'q': q}, stop_event=stop_event)
+                    try:
+                        status = r.status_code
+                        content = _read_until_match(r) if status == 200 else b''
+                    finally:
+                        # Drop the rest of the body before any backoff sleep
+                        r.close()
+                    if status == 200:
+                        if has_captcha(content):
+                            results.append(Result(it.idx, q, False, {}, http_status=status, note='captcha'))
+                            attempts[it.idx] = attempts.get(it.idx, 0) + 1
+                            backoff(attempts[it.idx], stop_event=stop_event)
+                        else:
+                            res = Result(it.idx, q, True, {}, http_status=200)
+                            pending.append((res, parser.submit(parse_listing, content)))
+                            results.append(res)
+                    elif status in (401, 403):
+                        results.append(Result(it.idx, q, False, {}, http_status=status, note='access'))
+                        attempts[it.idx] = attempts.get(it.idx, 0) + 1
+                        backoff(attempts[it.idx], stop_event=stop_event)
+                    elif status in (429, 503):
+                        ra = r.headers.get('Retry-After')
+                        results.append(Result(it.idx, q, False, {}, http_status=status, note='rate'))
+                        attempts[it.idx] = attempts.get(it.idx, 0) + 1
+                        backoff(attempts[it.idx], int(ra) if ra and ra.isdigit() else None, stop_event=stop_event)
+                    else:
+                        results.append(Result(it.idx, q, False, {}, http_status=status, note='http'))
+                        respectful_sleep(1, stop_event=stop_event)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    results.append(Result(it.idx, q, False, {}, http_status=None, note=str(e)))
+                    respectful_sleep(1, stop_event=stop_event)
+
+                processed += 1
+                if pcb:
+                    pcb(processed, total, f"processed idx={it.idx}")
+
+                # checkpoint every 5 new rows
+                if len(results) - last_flushed_idx >= 5:
+                    _collect_parsed(pending)
+                    header_written = append_ck(results[last_flushed_idx:], checkpoint, header_written)
+                    last_flushed_idx = len(results)
+        finally:
+            # Also runs when a stop or an unexpected error escapes the loop
+            _collect_parsed(pending)
+            append_ck(results[last_flushed_idx:], checkpoint, header_written)
+    return results
 
+def _collect_parsed(pending: List[Tuple[Result, Future]]):
+    for res, fut in pending:
         try:
-            if progress_cb:
-                progress_cb(processed, total, f"GET {url} q={q}")
-            r = client.get(url, params={'q': q}, stop_event=stop_event)
-            status = r.status_code
-            if status == 200:
-                text = r.text
-                if has_captcha(text):
-                    results.append(Result(it.idx, q, False, {}, http_status=status, note='captcha'))
-                    attempts[it.idx] = attempts.get(it.idx, 0) + 1
-                    backoff(attempts[it.idx], stop_event=stop_event)
-                else:
-                    data = parse_listing(text)
-                    results.append(Result(it.idx, q, True, data, http_status=200))
-            elif status in (401, 403):
-                results.append(Result(it.idx, q, False, {}, http_status=status, note='access'))
-                attempts[it.idx] = attempts.get(it.idx, 0) + 1
-                backoff(attempts[it.idx], stop_event=stop_event)
-            elif status in (429, 503):
-                ra = r.headers.get('Retry-After')
-                results.append(Result(it.idx, q, False, {}, http_status=status, note='rate'))
-                attempts[it.idx] = attempts.get(it.idx, 0) + 1
-                backoff(attempts[it.idx], int(ra) if ra and ra.isdigit() else None, stop_event=stop_event)
-            else:
-                results.append(Result(it.idx, q, False, {}, http_status=status, note='http'))
-                respectful_sleep(1, stop_event=stop_event)
-        except StopIteration:
-            break
+            res.data = fut.result()
         except Exception as e:
-            results.append(Result(it.idx, q, False, {}, http_status=None, note=str(e)))
-            respectful_sleep(1, stop_event=stop_event)
-
-        processed += 1
-        if progress_cb:
-            progress_cb(processed, total, f"processed idx={it.idx}")
+            res.ok = False
+            res.note = str(e)
+    pending.clear()
 
-        # checkpoint every 5
-        if len(results) % 5 == 0 and results:
-            _flush_checkpoint(results, checkpoint)
+def _read_checkpoint(path: str) -> Tuple[set[int], bool]:
+    """Return the idx values already in the checkpoint and whether it has a header.
 
-    _flush_checkpoint(results, checkpoint)
-    return results
-
-def _flush_checkpoint(results: List[Result], path: str):
-    if not results:
-        return
+    Rows without a valid idx are skipped; a file that cannot be read at all is
+    moved aside so new rows never land under a broken header.
+    """
+    if not os.path.exists(path):
+        return set(), False
+    done: set[int] = set()
+    bad = 0
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames is None:
+                return set(), False
+            if 'idx' not in reader.fieldnames:
+                raise ValueError('no idx column')
+            for row in reader:
+                try:
+                    done.add(int(row['idx']))
+                except (TypeError, ValueError):
+                    bad += 1
+    except (ValueError, csv.Error) as e:
+        bad_path = dedupe_path(f'{path}.bad')
+        os.replace(path, bad_path)
+        log.warning('Unreadable checkpoint %s (%s), moved to %s', path, e, bad_path)
+        return set(), False
+    if bad:
+        log.warning('Skipped %d checkpoint rows without a valid idx in %s', bad, path)
+    return done, True
+
+CHECKPOINT_FIELDS = ['idx', 'query', 'ok', 'http_status', 'note'] + [f'data_{k}' for k in LISTING_FIELDS]
+
+def _append_checkpoint(new_results: List[Result], path: str, header_written: bool) -> bool:
+    """Append rows to the checkpoint CSV; returns whether a header is now present."""
+    if not new_results:
+        return header_written
     rows = [{
         'idx': r.idx,
         'query': r.query,
@@ -258,18 +429,63 @@ def _flush_checkpoint(results: List[Result], path: str):
         'http_status': r.http_status,
         'note': r.note,
         **{f'data_{k}': v for k, v in (r.data or {}).items()},
-    } for r in results]
-    df = pd.DataFrame(rows)
-    df.to_csv(path, index=False, encoding='utf-8')
+    } for r in new_results]
+    fields = list(CHECKPOINT_FIELDS)
+    if header_written:
+        # Keep the column layout of the existing file
+        with open(path, newline='', encoding='utf-8') as f:
+            fields = next(csv.reader(f), None) or fields
+    keys = dict.fromkeys([*CHECKPOINT_FIELDS, *(k for row in rows for k in row)])
+    extra = [k for k in keys if k not in fields]
+    if extra:
+        fields += extra
+        if header_written:
+            # New columns: rewrite the file once with the widened header
+            with open(path, newline='', encoding='utf-8') as f:
+                old_rows = list(csv.DictReader(f))
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                w = csv.DictWriter(f, fieldnames=fields)
+                w.writeheader()
+                w.writerows(old_rows)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        if not header_written:
+            w.writeheader()
+        w.writerows(rows)
+    return True
+
+def _rows_to_df(results: List[Result]) -> pd.DataFrame:
+    """Build the output frame column by column instead of from per-row dicts."""
+    import pandas as pd
+
+    cols: Dict[str, list] = {
+        'idx': [r.idx for r in results],
+        'query': [r.query for r in results],
+        'ok': [r.ok for r in results],
+        'http_status': [r.http_status for r in results],
+        'note': [r.note for r in results],
+    }
+    # Ordered union of data keys, in order of first appearance
+    keys = dict.fromkeys(k for r in results if r.data for k in r.data)
+    for k in keys:
+        cols[f'data_{k}'] = [r.data.get(k) if r.data else None for r in results]
+    return pd.DataFrame(cols)
 
 def dedupe_path(path: str) -> str:
-    base, ext = os.path.splitext(path)
-    cand = path
+    d = os.path.dirname(path)
+    try:
+        # One directory listing instead of a stat per candidate; normcase keeps
+        # the comparison case-insensitive on Windows like os.path.exists.
+        existing = {os.path.normcase(n) for n in os.listdir(d or '.')}
+    except OSError:
+        existing = set()
+    base, ext = os.path.splitext(os.path.basename(path))
+    cand = os.path.basename(path)
     i = 1
-    while os.path.exists(cand):
+    while os.path.normcase(cand) in existing:
         cand = f"{base} ({i}){ext}"
         i += 1
-    return cand
+    return os.path.join(d, cand)
 
 def save_output(results: List[Result], src_excel: str, out_base: Optional[str] = None) -> Tuple[str, str]:
     if out_base is None:
@@ -280,16 +496,22 @@ def save_output(results: List[Result], src_excel: str, out_base: Optional[str] =
     csv_path = dedupe_path(csv_path)
     xlsx_path = dedupe_path(xlsx_path)
 
-    rows = [{
-        'idx': r.idx,
-        'query': r.query,
-        'ok': r.ok,
-        'http_status': r.http_status,
-        'note': r.note,
-        **{f'data_{k}': v for k, v in (r.data or {}).items()},
-    } for r in results]
-    df = pd.DataFrame(rows)
+    df = _rows_to_df(results)
     df.to_csv(csv_path, index=False, encoding='utf-8')
-    with pd.ExcelWriter(xlsx_path, engine='openpyxl') as w:
-        df.to_excel(w, index=False, sheet_name='Results')
+    _write_xlsx(df, xlsx_path)
     return csv_path, xlsx_path
+
+def _write_xlsx(df: pd.DataFrame, path: str, sheet_name: str = 'Results'):
+    # constant_memory streams each row to disk, but only accepts rows in order;
+    # DataFrame.to_excel writes column by column, so rows are written here directly.
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        ws = wb.add_worksheet(sheet_name)
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        rows = df.astype(object).where(df.notna(), None).to_numpy().tolist()
+        for i, row in enumerate(rows, start=1):
+            ws.write_row(i, 0, row)
+    finally:
+        wb.close()
@@ -50,11 +50,14 @@ def main():
 
     def run_worker(excel, cookies, rate, burst):
         try:
-            cfg = ClientConfig(rate_per_min=rate, burst=burst)
-            client = AvitoClient(cookies, cfg)
             items = load_items_from_excel(excel)
             ui_log(f"Загружено позиций: {len(items)}")
-            results = process_items(items, client, checkpoint="checkpoint.csv", stop_event=stop_event, progress_cb=on_progress)
+            cfg = ClientConfig(rate_per_min=rate, burst=burst)
+            client = AvitoClient(cookies, cfg)
+            try:
+                results = process_items(items, client, checkpoint="checkpoint.csv", stop_event=stop_event, progress_cb=on_progress)
+            finally:
+                client.close()
             csv_path, xlsx_path = save_output(results, excel)
             ui_log(f"Готово. CSV: {csv_path} | XLSX: {xlsx_path}")
         except Exception as e:
@@ -0,0 +1,181 @@
+import pytest
+
+from app.analyzer import _read_until_match, parse_listing
+
+
+class FakeResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.read = 0
+
+    def iter_bytes(self, chunk_size: int):
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i:i + chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+
+def _page(jsonld: bool) -> bytes:
+    parts = [
+        b'<html><body>' + b'x' * 70_000,
+        'Похожие: 3 500 ₽'.encode('utf-8'),
+        b'y' * 190_000,
+    ]
+    if jsonld:
+        parts.append(b'<script type="application/ld+json">'
+                     b'{"@type":"Product","offers":{"price":15000,"priceCurrency":"RUB"}}'
+                     b'</script>')
+    parts.append(b'z' * 10_000 + b'</body></html>')
+    return b''.join(parts)
+
+
+def test_jsonld_after_price_text_wins():
+    r = FakeResponse(_page(jsonld=True))
+    body = _read_until_match(r)
+    assert parse_listing(body) == {'found_price_text': '15000'}
+    assert r.read < len(r.body)
+
+
+def test_price_regex_is_fallback_without_jsonld():
+    r = FakeResponse(_page(jsonld=False))
+    body = _read_until_match(r)
+    assert r.read == len(r.body)
+    assert parse_listing(body) == {'found_price_text': '3 500 ₽'}
+
+
+def test_jsonld_split_across_chunks():
+    body = _page(jsonld=True)
+    for size in (7, 1000, 4096):
+        r = FakeResponse(body)
+        assert parse_listing(_read_until_match(r, chunk_size=size)) == {'found_price_text': '15000'}
+
+
+def test_price_re_matches_utf8_bytes_under_re2():
+    re2 = pytest.importorskip('re2')
+    from app import analyzer
+
+    assert analyzer.re2 is re2
+    m = analyzer.PRICE_RE.search('Цена 3 500 ₽ и 1 200 р'.encode('utf-8'))
+    assert m is not None
+    assert m.group(1).decode('utf-8') == '3 500 ₽'
+    assert analyzer._JSONLD_RE.search(
+        '<script type="application/ld+json">{"name":"Пылесос"}</script>'.encode('utf-8')
+    ) is not None
+
+
+def test_resume_skips_bad_rows_without_a_second_header(tmp_path):
+    from app.analyzer import Result, _append_checkpoint, _read_checkpoint
+
+    path = tmp_path / 'checkpoint.csv'
+    path.write_text('idx,query\n1,a\n,b\n', encoding='utf-8')
+    done, header_written = _read_checkpoint(str(path))
+    assert done == {1}
+    assert header_written
+
+    _append_checkpoint([Result(2, 'c', True, {'found_price_text': '5 ₽'}, 200)], str(path), header_written)
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == 'idx,query,ok,http_status,note,data_found_price_text'
+    assert sum(line.startswith('idx,') for line in lines) == 1
+    assert lines[-1] == '2,c,True,200,,5 ₽'
+
+
+def test_unreadable_checkpoint_is_moved_aside(tmp_path):
+    from app.analyzer import _read_checkpoint
+
+    path = tmp_path / 'checkpoint.csv'
+    path.write_text('foo,bar\n1,2\n', encoding='utf-8')
+    assert _read_checkpoint(str(path)) == (set(), False)
+    assert not path.exists()
+    assert (tmp_path / 'checkpoint.csv.bad').exists()
+
+
+def test_large_open_script_is_scanned_once():
+    state = b'<script>window.__state={"items":[' + b'1,' * 150_000 + b'0]}</script>'
+    breadcrumbs = b'<script type="application/ld+json">{"@type":"BreadcrumbList"}</script>'
+    product = (b'<script type="application/ld+json">'
+               b'{"@type":"Product","offers":{"price":990}}</script>')
+    body = b'<html>' + state + breadcrumbs + product + b'x' * 100_000
+    r = FakeResponse(body)
+    # Small chunks keep the script open across thousands of reads
+    assert parse_listing(_read_until_match(r, chunk_size=64)) == {'found_price_text': '990'}
+    assert r.read < len(body)
+
+
+def test_checkpoint_keeps_price_column_after_failed_first_batch(tmp_path):
+    from app.analyzer import Result, _append_checkpoint
+
+    path = str(tmp_path / 'checkpoint.csv')
+    header_written = _append_checkpoint([Result(1, 'a', False, {}, 403, 'access')], path, False)
+    header_written = _append_checkpoint([Result(2, 'b', True, {'found_price_text': '1 ₽'}, 200)], path, header_written)
+    _append_checkpoint([Result(3, 'c', True, {'found_price_text': '2 ₽', 'extra': 'x'}, 200)], path, header_written)
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines == [
+        'idx,query,ok,http_status,note,data_found_price_text,data_extra',
+        '1,a,False,403,access,,',
+        '2,b,True,200,,1 ₽,',
+        '3,c,True,200,,2 ₽,x',
+    ]
+
+
+@pytest.mark.parametrize('with_buy', [True, False])
+def test_load_items_with_and_without_buy_column(tmp_path, with_buy):
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('openpyxl')
+    from app.analyzer import load_items_from_excel
+
+    cols = {'A': ['Bosch', None, ''], 'B': ['GSR 12V', 'Makita DF333', None]}
+    if with_buy:
+        cols['C'] = ['1 200,50', 'n/a', '']
+    path = str(tmp_path / 'items.xlsx')
+    pd.DataFrame(cols).to_excel(path, index=False)
+
+    items = load_items_from_excel(path)
+    assert [(it.idx, it.query_str) for it in items] == [(0, 'Bosch GSR 12V'), (1, 'Makita DF333')]
+    assert [it.buy_price for it in items] == ([1200.5, None] if with_buy else [None, None])
+
+
+def test_token_bucket_bursts_then_paces(monkeypatch):
+    from app import analyzer
+
+    clock = [1000.0]
+    monkeypatch.setattr(analyzer.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(analyzer.time, 'sleep', lambda s: clock.__setitem__(0, clock[0] + s))
+
+    bucket = analyzer.TokenBucket(rate_per_minute=120, burst=3)
+    sent = []
+    for _ in range(6):
+        bucket.acquire()
+        sent.append(round(clock[0] - 1000.0, 6))
+    assert sent == [0.0, 0.0, 0.0, 0.5, 1.0, 1.5]
+
+    # After an idle period the burst is available again, but no more than that
+    clock[0] += 10
+    sent = []
+    for _ in range(4):
+        bucket.acquire()
+        sent.append(round(clock[0] - 1011.5, 6))
+    assert sent == [0.0, 0.0, 0.0, 0.5]
+
+
+def test_save_output_writes_rows_in_order(tmp_path):
+    pytest.importorskip('pandas')
+    pytest.importorskip('xlsxwriter')
+    openpyxl = pytest.importorskip('openpyxl')
+    from app.analyzer import Result, save_output
+
+    results = [
+        Result(0, 'a', True, {'found_price_text': '1 ₽'}, 200),
+        Result(1, 'b', False, {}, 429, 'rate'),
+        Result(2, 'c', True, {'found_price_text': '3 ₽'}, 200),
+    ]
+    csv_path, xlsx_path = save_output(results, 'items.xlsx', out_base=str(tmp_path / 'out'))
+    assert csv_path.endswith('out.csv')
+
+    ws = openpyxl.load_workbook(xlsx_path, read_only=True)['Results']
+    assert list(ws.values) == [
+        ('idx', 'query', 'ok', 'http_status', 'note', 'data_found_price_text'),
+        (0, 'a', True, 200, None, '1 ₽'),
+        (1, 'b', False, 429, 'rate', None),
+        (2, 'c', True, 200, None, '3 ₽'),
+    ]